@@ -0,0 +1,23 @@
+"""
+Pytest fixtures for the interactive test scripts in this directory.
+
+Run back-to-back under pytest, the scripts share one started client so the
+whole session pays the MTProto handshake once; each script also stays
+runnable standalone through its __main__ block. Lives at the repo root
+(rather than a tests/ package) because that is where the test scripts are.
+
+The client's transport is bound to the loop it started on, so fixture and
+tests are pinned to one session-scoped loop via the
+asyncio_default_*_loop_scope settings in pyproject.toml.
+"""
+
+import pytest_asyncio
+
+from teledownloadr.core import _client_pool
+
+@pytest_asyncio.fixture(scope="session")
+async def shared_client():
+    """One started Pyrogram client for the whole test session."""
+    _, app = await _client_pool.get_or_start()
+    yield app
+    await _client_pool.release()
@@ -1,15 +1,28 @@
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Only walk the filesystem for a .env file when the credentials aren't
+# already exported; skips the dotenv import entirely on frozen builds
+if not os.getenv("API_ID"):
+    from dotenv import load_dotenv
+    load_dotenv()
 
-API_ID = os.getenv("API_ID")
-API_HASH = os.getenv("API_HASH")
+# Cast once at load; failing here is much faster than letting Pyrogram's
+# async handshake time out on bad credentials
+_raw_api_id = os.getenv("API_ID")
+API_ID = int(_raw_api_id) if _raw_api_id and _raw_api_id.isdigit() else None
+API_HASH = os.getenv("API_HASH") or None
 BOT_TOKEN = os.getenv("BOT_TOKEN") # Optional, if using bot mode
 
+if API_ID is None or API_HASH is None:
+    raise RuntimeError(
+        "API_ID/API_HASH not configured. Set them in a .env file or the environment "
+        "(see https://my.telegram.org)."
+    )
+
 # Default download location
 DOWNLOAD_DIR = os.path.join(os.getcwd(), "downloads")
 
-if not os.path.exists(DOWNLOAD_DIR):
-    os.makedirs(DOWNLOAD_DIR)
+def ensure_download_dir():
+    """Create the download directory if needed. Called lazily (not at import)
+    to keep module import side-effect free and fast under PyInstaller."""
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
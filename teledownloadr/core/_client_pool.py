@@ -0,0 +1,60 @@
+"""
+Process-wide cache of a started TelegramClient.
+
+The MTProto handshake in TelegramClient.start() costs seconds of network
+round trips. Scripts that run several test flows in one process should pay
+it once: each flow acquires the client with get_or_start() and gives it
+back with release(); the connection is only torn down when the last user
+releases it. A runner can call get_or_start() once around a whole batch to
+keep the session alive between flows.
+
+The interactive app keeps managing its own client via the async context
+manager on TelegramClient.
+"""
+
+from teledownloadr.core.client import TelegramClient
+
+_cached: TelegramClient | None = None
+_refs = 0
+
+async def get_or_start():
+    """
+    Return (client_wrapper, started pyrogram app), starting the client on
+    first use and reusing the live connection afterwards.
+    """
+    global _cached, _refs
+    if _cached is None:
+        _cached = TelegramClient()
+    app = await _cached.start()
+    _refs += 1
+    return _cached, app
+
+async def run_with_client(test_fn):
+    """
+    Standalone-run helper for the test scripts: start the pooled client,
+    await test_fn(app), and release. Under pytest the scripts receive the
+    session-scoped shared_client fixture instead and skip this path.
+    """
+    from teledownloadr.utils.display import tui
+
+    try:
+        _, app = await get_or_start()
+    except Exception as e:
+        tui.print_error(f"Failed to start client: {e}")
+        return
+    try:
+        await test_fn(app)
+    finally:
+        await release()
+
+async def release():
+    """
+    Give back one reference; stops the client once nobody holds it.
+    Safe to call even if get_or_start() failed.
+    """
+    global _cached, _refs
+    if _refs > 0:
+        _refs -= 1
+    if _refs == 0 and _cached is not None:
+        await _cached.stop()
+        _cached = None
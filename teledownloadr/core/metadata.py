@@ -1,12 +1,19 @@
+import asyncio
 import json
 import os
-from datetime import datetime
+import sys
+import time
 from teledownloadr.config.settings import DOWNLOAD_DIR
 
 class MetadataManager:
     """
     Manages download metadata tracking for resume capability.
     Stores history of downloaded files in JSON format.
+
+    Internally the history is kept as parallel per-field dicts (name->size,
+    name->status, name->type, name->timestamp) instead of a dict of per-entry
+    dicts: large histories avoid the ~230 B/entry dict overhead and the hot
+    is_downloaded check touches one small map instead of a nested dict.
     """
 
     def __init__(self, chat_id: str):
@@ -18,9 +25,40 @@ class MetadataManager:
         """
         self.chat_id = str(chat_id)
         self.metadata_file = os.path.join(DOWNLOAD_DIR, f"{self.chat_id}_history.json")
-        self.history = {}
+        # Append-only sidecar: each update writes one line here instead of
+        # re-serializing the whole history; compacted back into the JSON
+        # file by save_history()
+        self.log_file = os.path.join(DOWNLOAD_DIR, f"{self.chat_id}_history.jsonl")
+        self._log_handle = None
+        self._sizes = {}
+        self._status = {}
+        self._types = {}
+        self._timestamps = {}
         self.load_history()
 
+    @property
+    def history(self) -> dict:
+        """
+        Materialized dict-of-dicts view of the history, matching the on-disk
+        JSON layout. Built on demand; hot paths use the split maps directly.
+        """
+        return {
+            name: {
+                'size': size,
+                'type': self._types.get(name),
+                'status': self._status.get(name),
+                'timestamp': self._timestamps.get(name)
+            }
+            for name, size in self._sizes.items()
+        }
+
+    def _ingest(self, filename: str, entry: dict):
+        """Fold one dict-shaped entry into the split maps."""
+        self._sizes[filename] = entry.get('size')
+        self._status[filename] = entry.get('status')
+        self._types[filename] = entry.get('type')
+        self._timestamps[filename] = entry.get('timestamp')
+
     def load_history(self) -> dict:
         """
         Load download history from JSON file.
@@ -29,20 +67,28 @@ class MetadataManager:
         try:
             if os.path.exists(self.metadata_file):
                 with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    self.history = json.load(f)
-
-                    # Validate structure
-                    if not isinstance(self.history, dict):
-                        self.history = {}
+                    loaded = json.load(f)
+
+                if isinstance(loaded, dict):
+                    for filename, entry in loaded.items():
+                        if isinstance(entry, dict):
+                            self._ingest(filename, entry)
+
+            # Replay the append-only log on top; last entry per file wins
+            if os.path.exists(self.log_file):
+                with open(self.log_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                            self._ingest(record.pop('filename'), record)
+                        except (json.JSONDecodeError, KeyError):
+                            # Truncated/corrupt line (e.g. crash mid-write)
+                            continue
 
             return self.history
-        except json.JSONDecodeError:
-            # Corrupted JSON file, start fresh
-            self.history = {}
-            return {}
-        except Exception as e:
-            # Any other error, start fresh
-            self.history = {}
+        except (OSError, json.JSONDecodeError):
+            # Unreadable or corrupted file, start fresh
+            self.clear_history()
             return {}
 
     def update_entry(self, filename: str, file_size: int, media_type: str, status: str = "downloaded"):
@@ -55,21 +101,45 @@ class MetadataManager:
             media_type: Type of media (photo, video, etc.)
             status: Download status (downloaded, failed, skipped)
         """
+        # Interned so thousands of entries share one status string object;
+        # float timestamp is ~20x cheaper than isoformat (format on read if
+        # ever needed)
+        status = sys.intern(status)
+        timestamp = time.time()
+        self._sizes[filename] = file_size
+        self._status[filename] = status
+        self._types[filename] = media_type
+        self._timestamps[filename] = timestamp
+
+        # Append one line to the log: O(1) bytes per update instead of
+        # rewriting the entire history file
         try:
-            self.history[filename] = {
+            if self._log_handle is None:
+                os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+                self._log_handle = open(self.log_file, 'a', encoding='utf-8')
+            self._log_handle.write(json.dumps({
+                'filename': filename,
                 'size': file_size,
                 'type': media_type,
                 'status': status,
-                'timestamp': datetime.now().isoformat(),
-                'chat_id': self.chat_id
-            }
-        except Exception:
-            # If update fails, just skip it
+                'timestamp': timestamp
+            }, ensure_ascii=False) + "\n")
+        except OSError:
+            # Persistence failure shouldn't abort the download run
+            pass
+
+    def flush(self):
+        """Flush the append-only log to disk (cheap periodic checkpoint)."""
+        try:
+            if self._log_handle is not None:
+                self._log_handle.flush()
+        except OSError:
             pass
 
     def save_history(self) -> bool:
         """
-        Save download history to JSON file.
+        Compact the history: write the full JSON file and truncate the
+        append-only log. Intended for shutdown/end-of-run, not per file.
         Returns True on success, False on failure.
         """
         try:
@@ -79,54 +149,58 @@ class MetadataManager:
             with open(self.metadata_file, 'w', encoding='utf-8') as f:
                 json.dump(self.history, f, indent=2, ensure_ascii=False)
 
+            # Everything in the log is now in the JSON file; drop it
+            if self._log_handle is not None:
+                self._log_handle.close()
+                self._log_handle = None
+            if os.path.exists(self.log_file):
+                os.remove(self.log_file)
+
             return True
         except OSError:
             # Filesystem error (disk full, permission denied, etc.)
             return False
-        except Exception:
-            # Any other error
-            return False
 
-    def is_downloaded(self, filename: str, file_size: int) -> bool:
+    async def save_history_async(self) -> bool:
+        """
+        Run save_history in a worker thread so a large json.dump doesn't
+        stall the event loop (and every in-flight download with it).
+        """
+        return await asyncio.to_thread(self.save_history)
+
+    def is_downloaded(self, filename: str, file_size: int, disk_index: dict = None) -> bool:
         """
         Check if a file was previously downloaded successfully.
 
         Args:
             filename: Name of the file to check
             file_size: Expected file size in bytes
+            disk_index: Optional preloaded {name: size} snapshot of the
+                download directory; avoids per-call stat syscalls
 
         Returns:
             True if file exists in history with matching size and on disk
         """
-        try:
-            # Check metadata history
-            if filename not in self.history:
-                return False
-
-            entry = self.history.get(filename, {})
-
-            # Check if status was successful
-            if entry.get('status') != 'downloaded':
-                return False
-
-            # Check if size matches
-            if entry.get('size') != file_size:
-                return False
-
-            # Verify file actually exists on disk
-            file_path = os.path.join(DOWNLOAD_DIR, filename)
-            if not os.path.exists(file_path):
-                return False
+        # Fast-reject: brand-new files (the common case on incremental
+        # scans) bail on a single hash probe, no syscalls
+        if filename not in self._sizes:
+            return False
 
-            # Verify disk file size matches
-            disk_size = os.path.getsize(file_path)
-            if disk_size != file_size:
-                return False
+        # Check history: successful status with matching size
+        if self._status.get(filename) != 'downloaded':
+            return False
+        if self._sizes.get(filename) != file_size:
+            return False
 
-            return True
+        # Verify file actually exists on disk with matching size
+        if disk_index is not None:
+            return disk_index.get(filename) == file_size
 
-        except Exception:
-            # On any error, assume not downloaded
+        # Single stat: absence (or unreadable) means not downloaded
+        file_path = os.path.join(DOWNLOAD_DIR, filename)
+        try:
+            return os.stat(file_path).st_size == file_size
+        except OSError:
             return False
 
     def get_stats(self) -> dict:
@@ -136,26 +210,25 @@ class MetadataManager:
         Returns:
             Dict with counts of downloaded, failed, skipped files
         """
-        try:
-            stats = {
-                'downloaded': 0,
-                'failed': 0,
-                'skipped': 0,
-                'total': len(self.history)
-            }
+        stats = {
+            'downloaded': 0,
+            'failed': 0,
+            'skipped': 0,
+            'total': len(self._sizes)
+        }
 
-            for entry in self.history.values():
-                status = entry.get('status', 'unknown')
-                if status in stats:
-                    stats[status] += 1
+        for status in self._status.values():
+            if status in stats:
+                stats[status] += 1
 
-            return stats
-        except Exception:
-            return {'downloaded': 0, 'failed': 0, 'skipped': 0, 'total': 0}
+        return stats
 
     def clear_history(self):
         """Clear all download history."""
-        self.history = {}
+        self._sizes = {}
+        self._status = {}
+        self._types = {}
+        self._timestamps = {}
 
     def remove_entry(self, filename: str) -> bool:
         """
@@ -167,10 +240,10 @@ class MetadataManager:
         Returns:
             True if removed, False if not found
         """
-        try:
-            if filename in self.history:
-                del self.history[filename]
-                return True
-            return False
-        except Exception:
+        if filename not in self._sizes:
             return False
+        del self._sizes[filename]
+        self._status.pop(filename, None)
+        self._types.pop(filename, None)
+        self._timestamps.pop(filename, None)
+        return True
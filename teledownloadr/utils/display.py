@@ -1,15 +1,168 @@
-from rich.console import Console
+import asyncio
+from time import monotonic
+
+from rich.console import Console, Group
 from rich.panel import Panel
 from rich.text import Text
-from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, TimeRemainingColumn, TransferSpeedColumn, TotalFileSizeColumn
 
-import questionary
+# questionary and rich.progress are imported lazily inside the methods that
+# need them: scripts that only log via print_info/success/error then skip
+# loading Rich's Live/render stack and prompt_toolkit at startup
+
+def chat_label(chat) -> str:
+    """Human-readable name for a chat/user, falling back to its ID."""
+    return chat.title or chat.first_name or str(chat.id)
+
+class ThrottledProgress:
+    """
+    Thin wrapper around rich.progress.Progress that drops redundant
+    per-chunk update() calls. A pure completed/total tick is forwarded only
+    when it moved the bar by at least ~1% or 0.25s passed since the last
+    repaint for that task; description changes and final ticks always go
+    through. Suppressed state is flushed on stop() so nothing is lost.
+    """
+
+    def __init__(self, progress, min_interval: float = 0.25, min_fraction: float = 0.01):
+        self._progress = progress
+        self._min_interval = min_interval
+        self._min_fraction = min_fraction
+        self._last = {}     # task_id -> (monotonic, completed) of last forwarded tick
+        self._pending = {}  # task_id -> kwargs of last suppressed tick
+        self._totals = {}   # task_id -> last known total
+
+    def __getattr__(self, name):
+        # Delegate everything not intercepted (start, tasks, console, ...)
+        return getattr(self._progress, name)
+
+    def add_task(self, description, **kwargs):
+        task_id = self._progress.add_task(description, **kwargs)
+        self._totals[task_id] = kwargs.get('total')
+        return task_id
+
+    def remove_task(self, task_id):
+        self._last.pop(task_id, None)
+        self._pending.pop(task_id, None)
+        self._totals.pop(task_id, None)
+        self._progress.remove_task(task_id)
+
+    def update(self, task_id, **kwargs):
+        if 'total' in kwargs:
+            self._totals[task_id] = kwargs['total']
+
+        # Anything beyond a progress tick (description, visibility, ...)
+        # repaints immediately
+        if set(kwargs) - {'completed', 'total'}:
+            self._forward(task_id, kwargs)
+            return
+
+        completed = kwargs.get('completed')
+        total = self._totals.get(task_id)
+
+        # Final tick: always show the bar hitting 100%
+        if completed is not None and total is not None and completed >= total:
+            self._forward(task_id, kwargs)
+            return
+
+        now = monotonic()
+        last_time, last_completed = self._last.get(task_id, (0.0, 0))
+        moved_enough = (
+            total and completed is not None and last_completed is not None
+            and (completed - last_completed) >= total * self._min_fraction
+        )
+        if moved_enough or now - last_time >= self._min_interval:
+            self._forward(task_id, kwargs)
+        else:
+            self._pending[task_id] = kwargs
+
+    def _forward(self, task_id, kwargs):
+        self._pending.pop(task_id, None)
+        self._last[task_id] = (monotonic(), kwargs.get('completed'))
+        self._progress.update(task_id, **kwargs)
+
+    def flush(self):
+        """Forward any suppressed ticks so the display matches reality."""
+        for task_id, kwargs in list(self._pending.items()):
+            self._forward(task_id, kwargs)
+
+    def stop(self):
+        self.flush()
+        self._progress.stop()
+
+    def __enter__(self):
+        self._progress.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+class _SharedProgressHandle:
+    """Ref-counting context manager over the TUI's shared Progress."""
+
+    def __init__(self, owner):
+        self._owner = owner
+
+    def __enter__(self):
+        return self._owner._acquire_progress()
+
+    def __exit__(self, *exc):
+        self._owner._release_progress()
 
 class TUI:
     def __init__(self):
-        self.console = Console()
+        self._console = Console()
+        # Log lines are batched for ~60ms and printed as one Group so bursts
+        # of status messages (parallel scans, skip storms) cost one console
+        # render instead of one per line
+        self._log_buf = []
+        self._flush_scheduled = False
+        # True while a questionary prompt owns the terminal; buffered logs
+        # are held until it returns the screen
+        self._prompt_active = False
+        # Pre-styled prefixes so log lines skip markup parsing entirely
+        self._ok = Text("✔ ", style="bold green")
+        self._err = Text("✖ ", style="bold red")
+        self._inf = Text("ℹ ", style="bold cyan")
+        # Shared progress display: one Live refresh thread for all
+        # concurrent downloaders instead of one per caller
+        self._shared_progress = None
+        self._progress_refs = 0
+
+    @property
+    def console(self):
+        # Direct console writes must not overtake buffered log lines:
+        # flush synchronously so output order always matches call order
+        self._flush_logs()
+        return self._console
+
+    def _flush_logs(self):
+        self._flush_scheduled = False
+        if self._prompt_active or not self._log_buf:
+            return
+        buf, self._log_buf = self._log_buf, []
+        self._console.print(Group(*buf))
+
+    def flush_logs(self):
+        """Print any buffered log lines immediately (call before exiting)."""
+        self._flush_logs()
+
+    def _log(self, renderable):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop (worker thread or sync context): print directly
+            self.console.print(renderable)
+            return
+        self._log_buf.append(renderable)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            loop.call_later(0.06, self._flush_logs)
 
     def print_banner(self):
+        # Piped/CI output gets a plain line instead of a centered panel
+        if not self.console.is_terminal:
+            self.console.print("TeleDownloadr — Media Downloader")
+            return
+
         title = Text("TeleDownloadr", style="bold magenta")
         subtitle = Text("Media Downloader", style="italic white")
         
@@ -22,23 +175,43 @@ class TUI:
         self.console.print(panel, justify="center")
         self.console.print()
 
+    def _prefixed(self, prefix: Text, message: str) -> Text:
+        # Only run the markup parser when the message can actually contain
+        # markup; plain strings (the common case) build a Text directly
+        body = Text.from_markup(message) if '[' in message else Text(message)
+        return Text.assemble(prefix, body)
+
     def print_success(self, message: str):
-        self.console.print(f"[bold green]✔[/] {message}")
+        self._log(self._prefixed(self._ok, message))
 
     def print_error(self, message: str):
-        self.console.print(f"[bold red]✖[/] {message}")
-    
+        self._log(self._prefixed(self._err, message))
+
     def print_info(self, message: str):
-        self.console.print(f"[bold cyan]ℹ[/] {message}")
+        self._log(self._prefixed(self._inf, message))
+
+    async def _prompt(self, question):
+        # Flush buffered logs before prompt_toolkit takes over the screen,
+        # and hold any new ones until it hands it back — a timed flush
+        # firing mid-prompt would write into the live display
+        self._flush_logs()
+        self._prompt_active = True
+        try:
+            return await question.ask_async()
+        finally:
+            self._prompt_active = False
+            self._flush_logs()
 
     async def ask_choice(self, message: str, choices: list[str]) -> str:
-        return await questionary.select(
+        import questionary
+        return await self._prompt(questionary.select(
             message,
             choices=choices
-        ).ask_async()
-    
+        ))
+
     async def ask_text(self, message: str, default: str = "") -> str:
-        return await questionary.text(message, default=default).ask_async()
+        import questionary
+        return await self._prompt(questionary.text(message, default=default))
     
     async def ask_checkbox(self, message: str, choices: list[str], instruction: str = None, use_shortcuts: bool = False, enable_search: bool = False) -> list[str]:
         """
@@ -54,46 +227,63 @@ class TUI:
         Returns:
             List of selected choices
         """
+        import questionary
+
         if enable_search and len(choices) > 20:
             # For large lists, offer search first using simple text input
             self.console.print(f"[cyan]ℹ[/] {len(choices)} items available.")
             self.console.print(f"[dim]Type keywords to filter, or leave empty to see all.[/]")
 
             # Use simple text input instead of autocomplete (more reliable)
-            search_query = await questionary.text(
+            search_query = await self._prompt(questionary.text(
                 "Search filter (or press Enter for all):",
                 default=""
-            ).ask_async()
+            ))
 
             if search_query and search_query.strip():
                 # Filter choices based on search query (case-insensitive)
                 search_lower = search_query.lower().strip()
-                filtered = [c for c in choices if search_lower in c.lower()]
+                # Lowercase once up front; the filter then only does substring
+                # probes and indexes back into the original choices. ASCII
+                # queries additionally scan as bytes, which hits the C-level
+                # memmem search instead of the wider unicode path
+                if search_lower.isascii():
+                    q = search_lower.encode()
+                    lowered_bytes = [c.lower().encode('utf-8', 'replace') for c in choices]
+                    filtered = [choices[i] for i, lb in enumerate(lowered_bytes) if q in lb]
+                else:
+                    lowered = [c.lower() for c in choices]
+                    filtered = [choices[i] for i, lc in enumerate(lowered) if search_lower in lc]
 
                 if filtered:
                     self.console.print(f"[green]✔[/] Found {len(filtered)} matching items (filtered from {len(choices)} total)")
 
                     # Show checkbox with filtered results
-                    return await questionary.checkbox(
+                    return await self._prompt(questionary.checkbox(
                         message,
                         choices=filtered,
                         instruction=instruction
-                    ).ask_async()
+                    ))
                 else:
                     self.console.print(f"[yellow]![/] No matches found for '{search_query}'. Showing all items.")
 
         # Standard checkbox (no search or search skipped)
-        return await questionary.checkbox(
+        return await self._prompt(questionary.checkbox(
             message,
             choices=choices,
             instruction=instruction
-        ).ask_async()
-    
+        ))
+
     async def ask_confirm(self, message: str) -> bool:
-        return await questionary.confirm(message).ask_async()
+        import questionary
+        return await self._prompt(questionary.confirm(message))
 
     def create_progress(self):
-        return Progress(
+        from rich.progress import (
+            Progress, SpinnerColumn, BarColumn, TextColumn,
+            TimeRemainingColumn, TransferSpeedColumn, TotalFileSizeColumn
+        )
+        return ThrottledProgress(Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
             BarColumn(),
@@ -101,8 +291,34 @@ class TUI:
             TransferSpeedColumn(),
             TotalFileSizeColumn(),
             TimeRemainingColumn(),
-            console=self.console
-        )
+            console=self.console,
+            # 4 repaints/s is plenty for a terminal; the default 10 burns
+            # noticeable CPU re-rendering the table during fast downloads
+            refresh_per_second=4,
+            redirect_stdout=False,
+            redirect_stderr=False
+        ))
+
+    def shared_progress(self):
+        """
+        Context manager yielding a process-wide Progress. Concurrent users
+        share one display (each adds its own tasks); the display starts on
+        first acquire and stops when the last user exits.
+        """
+        return _SharedProgressHandle(self)
+
+    def _acquire_progress(self):
+        if self._shared_progress is None:
+            self._shared_progress = self.create_progress()
+            self._shared_progress.start()
+        self._progress_refs += 1
+        return self._shared_progress
+
+    def _release_progress(self):
+        self._progress_refs -= 1
+        if self._progress_refs == 0:
+            self._shared_progress.stop()
+            self._shared_progress = None
 
 # Global instance
 tui = TUI()
@@ -0,0 +1,37 @@
+"""
+Shared graceful-shutdown wiring for the CLI and the interactive scripts.
+"""
+
+import asyncio
+import signal
+
+def install_shutdown(loop, notice: str = "\n\n🛑 Test cancelled by user") -> asyncio.Event:
+    """
+    Register SIGINT/SIGTERM handlers that set a fresh shutdown event, and
+    return that event.
+
+    The handler itself does nothing beyond setting the event; the optional
+    notice is printed by a watcher coroutine once the event fires, keeping
+    all real work out of signal context.
+    """
+    event = asyncio.Event()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, event.set)
+        except NotImplementedError:
+            # Windows ProactorEventLoop doesn't support add_signal_handler;
+            # fall back to the classic handler, scheduled onto the loop
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(event.set))
+
+    if notice:
+        async def _announce():
+            await event.wait()
+            # Through the TUI console so buffered log lines flush first
+            # instead of being overtaken by a raw print
+            from teledownloadr.utils.display import tui
+            tui.console.print(notice)
+
+        loop.create_task(_announce())
+
+    return event
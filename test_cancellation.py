@@ -1,47 +1,36 @@
 import asyncio
-import signal
-from teledownloadr.core.client import TelegramClient
+import traceback
+from teledownloadr.core._client_pool import run_with_client
 from teledownloadr.core.downloader import Downloader
-from teledownloadr.utils.display import tui
+from teledownloadr.utils.display import tui, chat_label
+from teledownloadr.utils.shutdown import install_shutdown
 
-async def test_cancellation():
+async def test_cancellation(shared_client):
     """
     Test the graceful shutdown/cancellation feature.
     This test downloads from a chat with limit=0 (all messages) to ensure
     we have time to test Ctrl+C cancellation.
     """
-    shutdown_event = asyncio.Event()
-
     # Get the current event loop
     loop = asyncio.get_running_loop()
 
-    # Define signal handler
-    def handle_shutdown():
-        print("\n\n🛑 Shutdown signal received! Cancelling downloads...")
-        shutdown_event.set()
-
-    # Register signal handlers (asyncio-aware)
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, handle_shutdown)
+    # Shared signal wiring: handlers only set the event, the notice prints
+    # from a loop-side watcher
+    shutdown_event = install_shutdown(loop, notice="\n\n🛑 Shutdown signal received! Cancelling downloads...")
 
     tui.print_banner()
     tui.print_info("Testing graceful shutdown with Ctrl+C")
     tui.print_info("Press Ctrl+C at any time to test cancellation")
 
-    # Initialize Client
-    client_wrapper = TelegramClient()
-    try:
-        app = await client_wrapper.start()
-    except Exception as e:
-        tui.print_error(f"Failed to start client: {e}")
-        return
+    # Client is provided by the caller (pytest fixture or standalone shim)
+    app = shared_client
 
     downloader = Downloader(app, shutdown_event=shutdown_event)
 
     try:
         # Fetch a chat with significant history
         tui.print_info("Fetching chats...")
-        dialogs, choices = await downloader.list_dialogs(limit=10)
+        dialogs, _ = await downloader.list_dialogs(limit=10, build_choices=False)
 
         if not dialogs:
             tui.print_error("No chats found")
@@ -49,7 +38,7 @@ async def test_cancellation():
 
         # Use the first chat
         selected_chat = dialogs[0]
-        chat_name = selected_chat.title or selected_chat.first_name or str(selected_chat.id)
+        chat_name = chat_label(selected_chat)
 
         tui.print_success(f"Using chat: {chat_name}")
         tui.print_info("Starting download with limit=0 (all messages)")
@@ -75,12 +64,11 @@ async def test_cancellation():
         shutdown_event.set()
     except Exception as e:
         tui.print_error(f"Error: {e}")
-        import traceback
         traceback.print_exc()
     finally:
         if shutdown_event.is_set():
             tui.print_info("Cleaning up after cancellation...")
-        await client_wrapper.stop()
+        tui.flush_logs()
         tui.print_success("Test completed. Goodbye!")
 
 if __name__ == "__main__":
@@ -91,4 +79,4 @@ if __name__ == "__main__":
     print("Press Ctrl+C at any time to test graceful shutdown.")
     print("="*60 + "\n")
 
-    asyncio.run(test_cancellation())
+    asyncio.run(run_with_client(test_cancellation))
@@ -1,63 +1,51 @@
 import asyncio
 import random
-import signal
-from teledownloadr.core.client import TelegramClient
+import traceback
+from teledownloadr.core._client_pool import run_with_client
 from teledownloadr.core.downloader import Downloader
-from teledownloadr.utils.display import tui
+from teledownloadr.utils.display import tui, chat_label
+from teledownloadr.utils.shutdown import install_shutdown
 
-async def test_download():
+async def test_download(shared_client):
     """
     Automated test: Download 5 videos from 5 random chats
     """
-    shutdown_event = asyncio.Event()
-
     # Get the current event loop
     loop = asyncio.get_running_loop()
 
-    # Define signal handler
-    def handle_shutdown():
-        print("\n\n🛑 Test cancelled by user")
-        shutdown_event.set()
-
-    # Register signal handlers (asyncio-aware)
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, handle_shutdown)
+    # Shared signal wiring: handlers only set the event, the notice prints
+    # from a loop-side watcher
+    shutdown_event = install_shutdown(loop)
 
     tui.print_banner()
     tui.print_info("Starting automated test: 5 videos from 5 random chats")
 
-    # Initialize Client
-    client_wrapper = TelegramClient()
-    try:
-        app = await client_wrapper.start()
-    except Exception as e:
-        tui.print_error(f"Failed to start client: {e}")
-        return
+    # Client is provided by the caller (pytest fixture or standalone shim)
+    app = shared_client
 
     downloader = Downloader(app, shutdown_event=shutdown_event)
 
     try:
         # Fetch available chats
         tui.print_info("Fetching available chats...")
-        dialogs, choices = await downloader.list_dialogs(limit=50)
+        dialogs, _ = await downloader.list_dialogs(limit=50, build_choices=False)
 
         if not dialogs or len(dialogs) < 5:
             tui.print_error(f"Not enough chats available. Found: {len(dialogs)}, need at least 5")
             return
 
-        # Select 5 random chats
-        selected_indices = random.sample(range(len(dialogs)), min(5, len(dialogs)))
-        selected_chats = [dialogs[i] for i in selected_indices]
+        # Select 5 random chats (sample the list directly, no index round-trip)
+        selected_chats = random.sample(dialogs, min(5, len(dialogs)))
 
         tui.print_success(f"Selected {len(selected_chats)} random chats:")
         for chat in selected_chats:
-            chat_name = chat.title or chat.first_name or str(chat.id)
+            chat_name = chat_label(chat)
             tui.print_info(f"  - {chat_name} ({chat.id})")
 
         # Configure downloads for each chat
         configs = []
         for chat in selected_chats:
-            chat_name = chat.title or chat.first_name or str(chat.id)
+            chat_name = chat_label(chat)
             configs.append({
                 'chat_id': chat.id,
                 'limit': 50,  # Check last 50 messages to find videos
@@ -73,10 +61,9 @@ async def test_download():
 
     except Exception as e:
         tui.print_error(f"An unexpected error occurred: {e}")
-        import traceback
         traceback.print_exc()
     finally:
-        await client_wrapper.stop()
+        tui.flush_logs()
 
 if __name__ == "__main__":
-    asyncio.run(test_download())
+    asyncio.run(run_with_client(test_download))
@@ -1,46 +1,35 @@
 import asyncio
 import random
-import signal
-from teledownloadr.core.client import TelegramClient
+import traceback
+from teledownloadr.core._client_pool import run_with_client
 from teledownloadr.core.downloader import Downloader
-from teledownloadr.utils.display import tui
+from teledownloadr.utils.display import tui, chat_label
+from teledownloadr.utils.shutdown import install_shutdown
 
-async def test_download_all():
+async def test_download_all(shared_client):
     """
     Test the "Download All" feature with a single chat.
     Tests both limited and unlimited (limit=0) message fetching.
     """
-    shutdown_event = asyncio.Event()
-
     # Get the current event loop
     loop = asyncio.get_running_loop()
 
-    # Define signal handler
-    def handle_shutdown():
-        print("\n\n🛑 Test cancelled by user")
-        shutdown_event.set()
-
-    # Register signal handlers (asyncio-aware)
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, handle_shutdown)
+    # Shared signal wiring: handlers only set the event, the notice prints
+    # from a loop-side watcher
+    shutdown_event = install_shutdown(loop)
 
     tui.print_banner()
     tui.print_info("Testing 'Download All' feature")
 
-    # Initialize Client
-    client_wrapper = TelegramClient()
-    try:
-        app = await client_wrapper.start()
-    except Exception as e:
-        tui.print_error(f"Failed to start client: {e}")
-        return
+    # Client is provided by the caller (pytest fixture or standalone shim)
+    app = shared_client
 
     downloader = Downloader(app, shutdown_event=shutdown_event)
 
     try:
         # Fetch available chats
         tui.print_info("Fetching available chats...")
-        dialogs, choices = await downloader.list_dialogs(limit=50)
+        dialogs, _ = await downloader.list_dialogs(limit=50, build_choices=False)
 
         if not dialogs or len(dialogs) < 1:
             tui.print_error(f"No chats available.")
@@ -48,7 +37,7 @@ async def test_download_all():
 
         # Select a random chat for testing
         selected_chat = random.choice(dialogs)
-        chat_name = selected_chat.title or selected_chat.first_name or str(selected_chat.id)
+        chat_name = chat_label(selected_chat)
 
         tui.print_success(f"Selected chat for testing: {chat_name} ({selected_chat.id})")
 
@@ -94,10 +83,9 @@ async def test_download_all():
 
     except Exception as e:
         tui.print_error(f"An unexpected error occurred: {e}")
-        import traceback
         traceback.print_exc()
     finally:
-        await client_wrapper.stop()
+        tui.flush_logs()
 
 if __name__ == "__main__":
-    asyncio.run(test_download_all())
+    asyncio.run(run_with_client(test_download_all))
@@ -1,40 +1,29 @@
 import asyncio
-import signal
-from teledownloadr.core.client import TelegramClient
+import traceback
+from teledownloadr.core._client_pool import run_with_client
 from teledownloadr.core.downloader import Downloader
 from teledownloadr.utils.display import tui
+from teledownloadr.utils.shutdown import install_shutdown
 
-async def test_dynamic_search():
+async def test_dynamic_search(shared_client):
     """
     Test Phase 5: Dynamic Chat Search
     - Fetches large number of chats (500+)
     - Demonstrates search-enabled checkbox
     - User can type to filter chats in real-time
     """
-    shutdown_event = asyncio.Event()
-
     # Get the current event loop
     loop = asyncio.get_running_loop()
 
-    # Define signal handler
-    def handle_shutdown():
-        print("\n\n🛑 Test cancelled by user")
-        shutdown_event.set()
-
-    # Register signal handlers (asyncio-aware)
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, handle_shutdown)
+    # Shared signal wiring: handlers only set the event, the notice prints
+    # from a loop-side watcher
+    shutdown_event = install_shutdown(loop)
 
     tui.print_banner()
     tui.print_info("Testing Dynamic Chat Search (Phase 5)")
 
-    # Initialize Client
-    client_wrapper = TelegramClient()
-    try:
-        app = await client_wrapper.start()
-    except Exception as e:
-        tui.print_error(f"Failed to start client: {e}")
-        return
+    # Client is provided by the caller (pytest fixture or standalone shim)
+    app = shared_client
 
     downloader = Downloader(app, shutdown_event=shutdown_event)
 
@@ -82,40 +71,52 @@ async def test_dynamic_search():
         proceed = await tui.ask_confirm("\nProceed with scanning selected chats?")
 
         if proceed:
-            # Extract IDs
-            targets = []
-            for sel in selections:
-                index = choices.index(sel)
-                targets.append(dialogs[index].id)
+            # Extract IDs via a dict instead of choices.index() per selection
+            choice_to_id = {c: d.id for c, d in zip(choices, dialogs)}
+            targets = [choice_to_id[sel] for sel in selections]
 
-            # Quick scan (limit 5 messages per chat for speed)
+            # Quick scan (limit 5 messages per chat for speed), run
+            # concurrently but bounded so we stay under flood limits
             tui.print_info("\n=== Quick Scan (5 messages per chat) ===")
-            for chat_id in targets:
-                try:
-                    file_list, count, total_size, chat_title, existing, new = await downloader.scan_chat(
+            scan_sem = asyncio.Semaphore(4)
+
+            # One shared downloads-dir snapshot instead of a directory
+            # enumeration per scanned chat
+            snapshot = await downloader.load_metadata_snapshot()
+
+            async def _quick_scan(chat_id):
+                async with scan_sem:
+                    return await downloader.scan_chat(
                         chat_id,
                         limit=5,
                         media_types=None,
-                        check_existing=True
+                        check_existing=True,
+                        existing_snapshot=snapshot
                     )
 
-                    if count > 0:
-                        tui.console.print(f"\n[bold]{chat_title}:[/] {count} files ({existing} existing, {new} new)")
-                    else:
-                        tui.console.print(f"\n[bold]{chat_title}:[/] No media in last 5 messages")
+            results = await asyncio.gather(
+                *[_quick_scan(chat_id) for chat_id in targets],
+                return_exceptions=True
+            )
 
-                except Exception as e:
-                    tui.print_error(f"Error scanning {chat_id}: {str(e)[:50]}")
+            for chat_id, result in zip(targets, results):
+                if isinstance(result, BaseException):
+                    tui.print_error(f"Error scanning {chat_id}: {str(result)[:50]}")
                     continue
 
+                file_list, count, total_size, chat_title, existing, new = result
+                if count > 0:
+                    tui.console.print(f"\n[bold]{chat_title}:[/] {count} files ({existing} existing, {new} new)")
+                else:
+                    tui.console.print(f"\n[bold]{chat_title}:[/] No media in last 5 messages")
+
         tui.print_success("\n✔ Phase 5 test completed!")
 
     except Exception as e:
         tui.print_error(f"An unexpected error occurred: {e}")
-        import traceback
         traceback.print_exc()
     finally:
-        await client_wrapper.stop()
+        tui.flush_logs()
 
 if __name__ == "__main__":
     print("\n" + "="*60)
@@ -128,4 +129,4 @@ if __name__ == "__main__":
     print("4. Show how search improves usability with many chats")
     print("="*60 + "\n")
 
-    asyncio.run(test_dynamic_search())
+    asyncio.run(run_with_client(test_dynamic_search))
@@ -1,7 +1,7 @@
 import asyncio
 import os
 import signal
-from teledownloadr.core.client import TelegramClient
+from teledownloadr.core._client_pool import get_or_start, release
 from teledownloadr.core.downloader import Downloader
 from teledownloadr.utils.display import tui
 
@@ -29,8 +29,7 @@ async def main():
         # Windows doesn't support add_signal_handler in the same way, but we are on Mac
         pass
 
-    client_wrapper = TelegramClient()
-    client = await client_wrapper.start()
+    client_wrapper, client = await get_or_start()
 
     if not client:
         tui.print_error("Failed to start client.")
@@ -66,7 +65,8 @@ async def main():
     except Exception as e:
         tui.print_error(f"\n❌ Test Failed: {e}")
     finally:
-        await client_wrapper.stop()
+        tui.flush_logs()
+        await release()
         tui.print_info("Client disconnected.")
 
 if __name__ == "__main__":
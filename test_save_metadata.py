@@ -1,54 +1,43 @@
 import asyncio
-import signal
+import re
 import os
-from teledownloadr.core.client import TelegramClient
-from teledownloadr.core.downloader import Downloader
-from teledownloadr.utils.display import tui
+import traceback
 
-async def test_save_metadata():
-    """
-    Test the save scan metadata feature (Phase 3).
-    This test scans a chat, displays files, and saves results to a text file.
-    """
-    shutdown_event = asyncio.Event()
-
-    # Get the current event loop
-    loop = asyncio.get_running_loop()
+# Async writes keep the loop free; fall back to a worker thread when
+# aiofiles isn't installed
+try:
+    import aiofiles
+except ImportError:
+    aiofiles = None
 
-    # Define signal handler
-    def handle_shutdown():
-        print("\n\n🛑 Test cancelled by user")
-        shutdown_event.set()
+from tests.runner import run_test
+from teledownloadr.core._client_pool import run_with_client
+from teledownloadr.utils.display import tui, chat_label
 
-    # Register signal handlers (asyncio-aware)
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, handle_shutdown)
+# Filename sanitization patterns, compiled once at import
+_RE_BAD = re.compile(r'[^\w\s-]')
+_RE_WS = re.compile(r'[-\s]+')
 
-    tui.print_banner()
-    tui.print_info("Testing Save Scan Metadata feature (Phase 3)")
+# Multiplying by the reciprocal is cheaper than dividing in the per-row loop
+_INV_MB = 1.0 / 1048576
 
-    # Initialize Client
-    client_wrapper = TelegramClient()
+def _save_sync(filename, payload):
+    """Single open/write/close; runs in a worker thread via to_thread()."""
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
     try:
-        app = await client_wrapper.start()
-    except Exception as e:
-        tui.print_error(f"Failed to start client: {e}")
-        return
-
-    downloader = Downloader(app, shutdown_event=shutdown_event)
-
-    try:
-        # Fetch available chats
-        tui.print_info("Fetching available chats...")
-        dialogs, choices = await downloader.list_dialogs(limit=10)
-
-        if not dialogs or len(dialogs) < 1:
-            tui.print_error("No chats available.")
-            return
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
 
+async def test_save_metadata(shared_client):
+    """
+    Test the save scan metadata feature (Phase 3).
+    This test scans a chat, displays files, and saves results to a text file.
+    """
+    async def body(downloader, dialogs, choices):
         # Use the first chat for testing
         selected_chat = dialogs[0]
-        chat_name = selected_chat.title or selected_chat.first_name or str(selected_chat.id)
+        chat_name = chat_label(selected_chat)
 
         tui.print_success(f"Selected chat for testing: {chat_name}")
 
@@ -62,8 +51,8 @@ async def test_save_metadata():
 
         # Show summary
         tui.print_info("\n=== Scan Summary ===")
-        total_gb = total_size / (1024 ** 3)
-        total_mb = total_size / (1024 ** 2)
+        total_mb = total_size * _INV_MB
+        total_gb = total_mb * (1.0 / 1024)
         tui.console.print(f"[bold]Found {count} files. Total Size: ~{total_mb:.2f} MB (~{total_gb:.4f} GB)[/]")
 
         if count == 0:
@@ -74,43 +63,55 @@ async def test_save_metadata():
         save_scan = await tui.ask_confirm("Save scan results to file?")
 
         if save_scan:
-            import re
             # Sanitize chat title for filename
-            sanitized_title = re.sub(r'[^\w\s-]', '', chat_title)
-            sanitized_title = re.sub(r'[-\s]+', '_', sanitized_title)
+            sanitized_title = _RE_BAD.sub('', chat_title)
+            sanitized_title = _RE_WS.sub('_', sanitized_title)
             filename = f"{sanitized_title}_{selected_chat.id}.txt"
 
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(f"Scan Results for {chat_title} ({selected_chat.id})\n")
-                    f.write("=" * 60 + "\n")
-                    f.write(f"Total Files: {count}\n")
-                    f.write(f"Total Size: {total_mb:.2f} MB ({total_gb:.4f} GB)\n")
-                    f.write("=" * 60 + "\n\n")
-
-                    for file_info in file_list:
-                        size_mb = file_info['size'] / (1024 * 1024)
-                        f.write(f"[{file_info['date']}] [{file_info['type']}] {file_info['filename']} ({size_mb:.2f} MB)\n")
+                # Build the whole report in memory and issue one async write:
+                # the event loop keeps servicing the client instead of
+                # blocking on a disk flush per line
+                header = (
+                    f"Scan Results for {chat_title} ({selected_chat.id})\n"
+                    f"{'=' * 60}\n"
+                    f"Total Files: {count}\n"
+                    f"Total Size: {total_mb:.2f} MB ({total_gb:.4f} GB)\n"
+                    f"{'=' * 60}\n\n"
+                )
+                lines = [
+                    f"[{fi['date']}] [{fi['type']}] {fi['filename']} ({fi['size'] * _INV_MB:.2f} MB)"
+                    for fi in file_list
+                ]
+                # Encode once and write bytes: skips the text-IO layer's
+                # incremental UTF-8 encoder entirely
+                payload = (header + "\n".join(lines) + "\n").encode('utf-8')
+                if aiofiles is not None:
+                    async with aiofiles.open(filename, 'wb') as f:
+                        await f.write(payload)
+                else:
+                    await asyncio.to_thread(_save_sync, filename, payload)
 
                 tui.print_success(f"✔ Saved metadata to {filename}")
 
-                # Verify the file was created
-                if os.path.exists(filename):
-                    file_size = os.path.getsize(filename)
+                # Verify the file was created (one stat, not exists+getsize)
+                try:
+                    file_size = os.stat(filename).st_size
+                except FileNotFoundError:
+                    tui.print_error("✗ File was not created!")
+                else:
                     tui.print_success(f"✔ File verified: {filename} ({file_size} bytes)")
 
-                    # Show first few lines
+                    # Show first few lines straight from the in-memory
+                    # report; no need to reopen what we just wrote
                     tui.print_info("\n=== First 10 lines of saved file ===")
-                    with open(filename, 'r', encoding='utf-8') as f:
-                        for i, line in enumerate(f):
-                            if i >= 10:
-                                break
-                            print(line.rstrip())
-                else:
-                    tui.print_error("✗ File was not created!")
+                    # Raw print() bypasses the log buffer, so flush the
+                    # header first or the preview would overtake it
+                    tui.flush_logs()
+                    for line in (header + "\n".join(lines[:4])).splitlines()[:10]:
+                        print(line)
             except Exception as e:
                 tui.print_error(f"Failed to save {filename}: {e}")
-                import traceback
                 traceback.print_exc()
         else:
             tui.print_info("Scan results not saved.")
@@ -130,12 +131,12 @@ async def test_save_metadata():
 
         tui.print_success("\n✔ Test completed!")
 
-    except Exception as e:
-        tui.print_error(f"An unexpected error occurred: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        await client_wrapper.stop()
+    # Only the top chat is used, so don't fetch (or format) more
+    await run_test(
+        body, shared_client,
+        intro="Testing Save Scan Metadata feature (Phase 3)",
+        dialogs_limit=1, build_choices=False
+    )
 
 if __name__ == "__main__":
     print("\n" + "="*60)
@@ -148,4 +149,4 @@ if __name__ == "__main__":
     print("4. Verify the file was created")
     print("="*60 + "\n")
 
-    asyncio.run(test_save_metadata())
+    asyncio.run(run_with_client(test_save_metadata))
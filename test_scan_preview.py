@@ -1,52 +1,41 @@
 import asyncio
-import signal
-from teledownloadr.core.client import TelegramClient
-from teledownloadr.core.downloader import Downloader
-from teledownloadr.utils.display import tui
+import os
+import re
+
+# Async writes keep the loop free; fall back to a worker thread when
+# aiofiles isn't installed
+try:
+    import aiofiles
+except ImportError:
+    aiofiles = None
+
+from tests.runner import run_test
+from teledownloadr.core._client_pool import run_with_client
+from teledownloadr.utils.display import tui, chat_label
+
+# Filename sanitization patterns, compiled once at import
+_RE_BAD = re.compile(r'[^\w\s-]')
+_RE_WS = re.compile(r'[-\s]+')
+
+# Multiplying by the reciprocal is cheaper than dividing in the per-row loop
+_INV_MB = 1.0 / 1048576
+
+def _save_sync(filename, payload):
+    """Single open/write/close; runs in a worker thread via to_thread()."""
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
 
-async def test_scan_preview():
+async def test_scan_preview(shared_client):
     """
     Test the scan & preview feature before downloading.
     """
-    shutdown_event = asyncio.Event()
-
-    # Get the current event loop
-    loop = asyncio.get_running_loop()
-
-    # Define signal handler
-    def handle_shutdown():
-        print("\n\n🛑 Test cancelled by user")
-        shutdown_event.set()
-
-    # Register signal handlers (asyncio-aware)
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, handle_shutdown)
-
-    tui.print_banner()
-    tui.print_info("Testing Scan & Preview feature")
-
-    # Initialize Client
-    client_wrapper = TelegramClient()
-    try:
-        app = await client_wrapper.start()
-    except Exception as e:
-        tui.print_error(f"Failed to start client: {e}")
-        return
-
-    downloader = Downloader(app, shutdown_event=shutdown_event)
-
-    try:
-        # Fetch available chats
-        tui.print_info("Fetching available chats...")
-        dialogs, choices = await downloader.list_dialogs(limit=10)
-
-        if not dialogs or len(dialogs) < 1:
-            tui.print_error("No chats available.")
-            return
-
+    async def body(downloader, dialogs, choices):
         # Use the first chat for testing
         selected_chat = dialogs[0]
-        chat_name = selected_chat.title or selected_chat.first_name or str(selected_chat.id)
+        chat_name = chat_label(selected_chat)
 
         tui.print_success(f"Selected chat for testing: {chat_name}")
 
@@ -60,7 +49,7 @@ async def test_scan_preview():
 
         # Show summary
         tui.print_info("\n=== Scan Summary ===")
-        total_gb = total_size / (1024 ** 3)
+        total_gb = total_size * _INV_MB * (1.0 / 1024)
         tui.console.print(f"[bold]Found {count} files. Total Size: ~{total_gb:.2f} GB[/]")
 
         # Ask if user wants to save scan results
@@ -68,35 +57,49 @@ async def test_scan_preview():
             save_scan = await tui.ask_confirm("Save scan results to file?")
 
             if save_scan:
-                import re
-                import os
                 # Sanitize chat title for filename
-                sanitized_title = re.sub(r'[^\w\s-]', '', chat_title)
-                sanitized_title = re.sub(r'[-\s]+', '_', sanitized_title).strip('_')
+                sanitized_title = _RE_BAD.sub('', chat_title)
+                sanitized_title = _RE_WS.sub('_', sanitized_title).strip('_')
                 if not sanitized_title:
                     sanitized_title = "Unknown_Chat"
 
                 filename = f"{sanitized_title}_{selected_chat.id}.txt"
 
                 try:
-                    with open(filename, 'w', encoding='utf-8') as f:
-                        f.write(f"Scan Results for {chat_title} ({selected_chat.id})\n")
-                        f.write("=" * 60 + "\n")
-                        f.write(f"Total Files: {count}\n")
-                        f.write(f"Total Size: {total_gb:.2f} GB\n")
-                        f.write("=" * 60 + "\n\n")
-
-                        for file_info in file_list:
-                            try:
-                                size_mb = file_info.get('size', 0) / (1024 * 1024)
-                                date_str = file_info.get('date', 'Unknown')
-                                file_type = file_info.get('type', 'Unknown')
-                                file_name = file_info.get('filename', 'Unknown')
-                                f.write(f"[{date_str}] [{file_type}] {file_name} ({size_mb:.2f} MB)\n")
-                            except:
-                                continue
-
-                    if os.path.exists(filename) and os.path.getsize(filename) > 0:
+                    # Assemble the report in memory and write it with one
+                    # async call so the event loop isn't stalled per line
+                    header = (
+                        f"Scan Results for {chat_title} ({selected_chat.id})\n"
+                        f"{'=' * 60}\n"
+                        f"Total Files: {count}\n"
+                        f"Total Size: {total_gb:.2f} GB\n"
+                        f"{'=' * 60}\n\n"
+                    )
+                    # Validate row shape once, then format in a tight
+                    # comprehension with no per-row exception handler
+                    safe = [
+                        (fi.get('date', 'Unknown'), fi.get('type', 'Unknown'),
+                         fi.get('filename', 'Unknown'), fi.get('size', 0))
+                        for fi in file_list if isinstance(fi, dict)
+                    ]
+                    lines = [f"[{d}] [{t}] {n} ({s * _INV_MB:.2f} MB)" for d, t, n, s in safe]
+
+                    # Encode once and write bytes: skips the text-IO layer's
+                    # incremental UTF-8 encoder entirely
+                    payload = (header + "\n".join(lines) + "\n").encode('utf-8')
+                    if aiofiles is not None:
+                        async with aiofiles.open(filename, 'wb') as f:
+                            await f.write(payload)
+                    else:
+                        await asyncio.to_thread(_save_sync, filename, payload)
+
+                    # One stat gives existence and size together
+                    try:
+                        created = os.stat(filename).st_size > 0
+                    except FileNotFoundError:
+                        created = False
+
+                    if created:
                         tui.print_success(f"Saved metadata to {filename}")
                     else:
                         tui.print_error(f"Failed to create {filename}")
@@ -118,12 +121,12 @@ async def test_scan_preview():
 
         tui.print_success("\nTest completed!")
 
-    except Exception as e:
-        tui.print_error(f"An unexpected error occurred: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        await client_wrapper.stop()
+    # Only the top chat is used, so don't fetch (or format) more
+    await run_test(
+        body, shared_client,
+        intro="Testing Scan & Preview feature",
+        dialogs_limit=1, build_choices=False
+    )
 
 if __name__ == "__main__":
     print("\n" + "="*60)
@@ -133,4 +136,4 @@ if __name__ == "__main__":
     print("You can then choose whether to proceed with download.")
     print("="*60 + "\n")
 
-    asyncio.run(test_scan_preview())
+    asyncio.run(run_with_client(test_scan_preview))
@@ -1,10 +1,9 @@
 import asyncio
-import signal
-from teledownloadr.core.client import TelegramClient
-from teledownloadr.core.downloader import Downloader
+from tests.runner import run_test
+from teledownloadr.core._client_pool import run_with_client
 from teledownloadr.utils.display import tui
 
-async def test_search_fix():
+async def test_search_fix(shared_client):
     """
     Test the fixed search functionality in chat selection.
     This verifies that:
@@ -13,44 +12,7 @@ async def test_search_fix():
     3. 'a' key filters chats (doesn't select all)
     4. Search is case-insensitive and works with partial matches
     """
-    shutdown_event = asyncio.Event()
-
-    # Get the current event loop
-    loop = asyncio.get_running_loop()
-
-    # Define signal handler
-    def handle_shutdown():
-        print("\n\n🛑 Test cancelled by user")
-        shutdown_event.set()
-
-    # Register signal handlers (asyncio-aware)
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, handle_shutdown)
-
-    tui.print_banner()
-    tui.print_info("Testing FIXED Dynamic Chat Search")
-
-    # Initialize Client
-    client_wrapper = TelegramClient()
-    try:
-        app = await client_wrapper.start()
-    except Exception as e:
-        tui.print_error(f"Failed to start client: {e}")
-        return
-
-    downloader = Downloader(app, shutdown_event=shutdown_event)
-
-    try:
-        # Fetch chats
-        tui.print_info("\n=== Fetching Chats for Search Test ===")
-        tui.print_info("Fetching 100 chats to test search functionality...")
-
-        dialogs, choices = await downloader.list_dialogs(limit=100)
-
-        if not dialogs or len(dialogs) < 1:
-            tui.print_error("No chats available.")
-            return
-
+    async def body(downloader, dialogs, choices):
         tui.print_success(f"✔ Loaded {len(dialogs)} chats")
 
         # Show search instructions
@@ -74,7 +36,10 @@ async def test_search_fix():
         tui.console.print("[bold green]TIP:[/] Start typing immediately when the list appears!")
         tui.console.print("")
 
-        input("Press Enter to continue to the search prompt...")
+        # Read from stdin in the default executor so the loop keeps running
+        # (heartbeats, pings) while we wait for the user
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, input, "Press Enter to continue to the search prompt...")
 
         # Test the fixed search
         tui.print_info("\n=== Search-Enabled Chat Selection ===")
@@ -102,14 +67,11 @@ async def test_search_fix():
         else:
             tui.print_error("✗ No selection made")
 
-    except KeyboardInterrupt:
-        tui.print_info("\nTest interrupted by user")
-    except Exception as e:
-        tui.print_error(f"An unexpected error occurred: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        await client_wrapper.stop()
+    await run_test(
+        body, shared_client,
+        intro="Testing FIXED Dynamic Chat Search",
+        dialogs_limit=100
+    )
 
 if __name__ == "__main__":
     print("\n" + "="*70)
@@ -125,4 +87,4 @@ if __name__ == "__main__":
     print("The FIX: use_shortcuts=False in ask_checkbox()")
     print("="*70 + "\n")
 
-    asyncio.run(test_search_fix())
+    asyncio.run(run_with_client(test_search_fix))
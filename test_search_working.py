@@ -1,52 +1,14 @@
 import asyncio
-import signal
-from teledownloadr.core.client import TelegramClient
-from teledownloadr.core.downloader import Downloader
+from tests.runner import run_test
+from teledownloadr.core._client_pool import run_with_client
 from teledownloadr.utils.display import tui
 
-async def test_search_working():
+async def test_search_working(shared_client):
     """
     Test the WORKING search functionality.
     Uses autocomplete for search, then checkbox for selection.
     """
-    shutdown_event = asyncio.Event()
-
-    # Get the current event loop
-    loop = asyncio.get_running_loop()
-
-    # Define signal handler
-    def handle_shutdown():
-        print("\n\n🛑 Test cancelled by user")
-        shutdown_event.set()
-
-    # Register signal handlers (asyncio-aware)
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        loop.add_signal_handler(sig, handle_shutdown)
-
-    tui.print_banner()
-    tui.print_info("Testing WORKING Chat Search (Autocomplete + Checkbox)")
-
-    # Initialize Client
-    client_wrapper = TelegramClient()
-    try:
-        app = await client_wrapper.start()
-    except Exception as e:
-        tui.print_error(f"Failed to start client: {e}")
-        return
-
-    downloader = Downloader(app, shutdown_event=shutdown_event)
-
-    try:
-        # Fetch chats
-        tui.print_info("\n=== Fetching Chats ===")
-        tui.print_info("Fetching 100 chats for search test...")
-
-        dialogs, choices = await downloader.list_dialogs(limit=600)
-
-        if not dialogs or len(dialogs) < 1:
-            tui.print_error("No chats available.")
-            return
-
+    async def body(downloader, dialogs, choices):
         tui.print_success(f"✔ Loaded {len(dialogs)} chats")
 
         # Show instructions
@@ -67,7 +29,10 @@ async def test_search_working():
         tui.console.print("  • Just press Enter → shows all chats")
         tui.console.print("")
 
-        input("Press Enter to continue...")
+        # Read from stdin in the default executor so the loop keeps running
+        # (heartbeats, pings) while we wait for the user
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, input, "Press Enter to continue...")
 
         # Test the working search
         tui.print_info("\n=== Chat Selection with Search ===")
@@ -97,39 +62,62 @@ async def test_search_working():
         proceed = await tui.ask_confirm("\nQuick scan selected chats (5 messages each)?")
 
         if proceed:
-            # Extract IDs
-            targets = []
-            for sel in selections:
-                index = choices.index(sel)
-                targets.append(dialogs[index].id)
+            # Extract IDs via a dict instead of a linear choices.index()
+            # scan per selection
+            choice_to_id = dict(zip(choices, (d.id for d in dialogs)))
+            targets = [choice_to_id[sel] for sel in selections]
 
+            # Scans are I/O-bound MTProto round trips, so overlap them with
+            # bounded concurrency instead of serializing per chat
             tui.print_info("\n=== Quick Scan ===")
-            for chat_id in targets:
-                try:
-                    file_list, count, total_size, chat_title, existing, new = await downloader.scan_chat(
-                        chat_id,
+            sem = asyncio.Semaphore(5)
+
+            # One shared downloads-dir snapshot instead of a directory
+            # enumeration per scanned chat
+            snapshot = await downloader.load_metadata_snapshot()
+
+            async def _scan(cid):
+                async with sem:
+                    return await downloader.scan_chat(
+                        cid,
                         limit=5,
                         media_types=None,
-                        check_existing=True
+                        check_existing=True,
+                        existing_snapshot=snapshot
                     )
 
-                    if count > 0:
-                        tui.console.print(f"\n[bold]{chat_title}:[/] {count} files ({existing} existing, {new} new)")
-                    else:
-                        tui.console.print(f"\n[bold]{chat_title}:[/] No media in last 5 messages")
-
-                except Exception as e:
-                    tui.print_error(f"Error scanning {chat_id}: {str(e)[:50]}")
+            results = await asyncio.gather(
+                *map(_scan, targets),
+                return_exceptions=True
+            )
+
+            # Collect all rows and render one table: a single console write
+            # instead of a styled print (and terminal reflow) per chat
+            from rich.table import Table
+            table = Table(title="Quick Scan")
+            table.add_column("Chat", style="bold")
+            table.add_column("Files", justify="right")
+            table.add_column("Existing", justify="right", style="green")
+            table.add_column("New", justify="right")
+
+            for chat_id, result in zip(targets, results):
+                if isinstance(result, BaseException):
+                    tui.print_error(f"Error scanning {chat_id}: {str(result)[:50]}")
                     continue
 
-    except KeyboardInterrupt:
-        tui.print_info("\nTest interrupted by user")
-    except Exception as e:
-        tui.print_error(f"An unexpected error occurred: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        await client_wrapper.stop()
+                file_list, count, total_size, chat_title, existing, new = result
+                if count > 0:
+                    table.add_row(chat_title, str(count), str(existing), str(new))
+                else:
+                    table.add_row(chat_title, "No media in last 5 messages", "", "")
+
+            tui.console.print(table)
+
+    await run_test(
+        body, shared_client,
+        intro="Testing WORKING Chat Search (Autocomplete + Checkbox)",
+        dialogs_limit=600
+    )
 
 if __name__ == "__main__":
     print("\n" + "="*70)
@@ -147,4 +135,4 @@ if __name__ == "__main__":
     print("Solution: Text Filter (search) → Checkbox (select)")
     print("="*70 + "\n")
 
-    asyncio.run(test_search_working())
+    asyncio.run(run_with_client(test_search_working))
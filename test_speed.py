@@ -1,7 +1,8 @@
 import asyncio
+import sys
 import time
 import signal
-from teledownloadr.core.client import TelegramClient
+from teledownloadr.core._client_pool import get_or_start, release
 from teledownloadr.core.downloader import Downloader
 from teledownloadr.utils.display import tui
 
@@ -9,19 +10,16 @@ from teledownloadr.utils.display import tui
 TEST_CHAT_ID = -1001955847750  # Paid Group
 TEST_LIMIT = 200               # More files to really see parallelism
 TEST_MEDIA_TYPES = None
+TEST_CONCURRENCIES = (1, 5, 10, 20)
 
-async def run_benchmark(concurrency: int, shutdown_event: asyncio.Event):
+async def run_benchmark(concurrency: int, client, shutdown_event: asyncio.Event) -> float:
+    """Run one download pass on an already-started client; returns seconds."""
     tui.print_info(f"\n🚀 Running Benchmark with Concurrency = {concurrency}")
-    
-    client_wrapper = TelegramClient()
-    client = await client_wrapper.start()
-    if not client:
-        return
-    
+
     downloader = Downloader(client, shutdown_event=shutdown_event)
-    
+
     start_time = time.time()
-    
+
     try:
         # Run download
         await downloader.download_from_chat(
@@ -35,14 +33,11 @@ async def run_benchmark(concurrency: int, shutdown_event: asyncio.Event):
         tui.print_info("Benchmark task cancelled.")
     except Exception as e:
         tui.print_error(f"Benchmark error: {e}")
-    finally:
-        end_time = time.time()
-        duration = end_time - start_time
-        
-        tui.print_success(f"✅ Benchmark Finished (Concurrency {concurrency})")
-        tui.print_info(f"Time: {duration:.2f} seconds")
-        
-        await client_wrapper.stop()
+
+    duration = time.time() - start_time
+    tui.print_success(f"✅ Benchmark Finished (Concurrency {concurrency})")
+    tui.print_info(f"Time: {duration:.2f} seconds")
+    return duration
 
 async def main():
     tui.print_info("=== 🏎 TeleDownloadr Speed Benchmark ===")
@@ -51,28 +46,60 @@ async def main():
     # Setup graceful shutdown
     shutdown_event = asyncio.Event()
     loop = asyncio.get_running_loop()
-    
+
+    # All benchmark work hangs off one root task; Ctrl+C cancels just that
+    # instead of sweeping every task in the loop
+    bench_task = None
+
     def signal_handler():
         tui.print_info("\n🛑 Stopping benchmark...")
         shutdown_event.set()
-        # Cancel all tasks?
-        for task in asyncio.all_tasks():
-            if task is not asyncio.current_task():
-                task.cancel()
+        if bench_task is not None and not bench_task.done():
+            bench_task.cancel()
 
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        try:
+    if sys.platform != "win32":
+        for sig in (signal.SIGINT, signal.SIGTERM):
             loop.add_signal_handler(sig, signal_handler)
-        except NotImplementedError:
-            pass # Windows
+    else:
+        # ProactorEventLoop has no add_signal_handler
+        signal.signal(signal.SIGINT, lambda *_: loop.call_soon_threadsafe(signal_handler))
+
+    async def _sweep(client):
+        # Runs are sequential on purpose: concurrent passes would share
+        # bandwidth and skew each other's timings
+        sweep_results = []
+        for concurrency in TEST_CONCURRENCIES:
+            if shutdown_event.is_set():
+                break
+            duration = await run_benchmark(concurrency, client, shutdown_event)
+            sweep_results.append((concurrency, duration))
+        return sweep_results
 
+    results = []
     try:
-        # Run parallel test
-        await run_benchmark(concurrency=10, shutdown_event=shutdown_event)
+        # One MTProto handshake shared by every run; reconnecting per pass
+        # used to dominate short benchmarks
+        client_wrapper, client = await get_or_start()
+        if not client:
+            return
+
+        bench_task = asyncio.ensure_future(_sweep(client))
+        results = await bench_task
     except asyncio.CancelledError:
         pass
     finally:
+        if results:
+            from rich.table import Table
+            table = Table(title="Benchmark Results")
+            table.add_column("Concurrency", justify="right")
+            table.add_column("Duration (s)", justify="right")
+            for concurrency, duration in results:
+                table.add_row(str(concurrency), f"{duration:.2f}")
+            tui.console.print(table)
+
         tui.print_info("Exiting...")
+        tui.flush_logs()
+        await release()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,54 @@
+"""
+Shared prologue/epilogue for the interactive test scripts.
+
+The scripts themselves live at the repository root; this module collapses
+the boilerplate they all repeated — shutdown wiring, banner, dialog fetch,
+error reporting and log flushing — so each file carries only its own body.
+"""
+
+import asyncio
+import traceback
+
+from teledownloadr.core.downloader import Downloader
+from teledownloadr.utils.display import tui
+from teledownloadr.utils.shutdown import install_shutdown
+
+
+async def run_test(body, client, *, intro=None, dialogs_limit=None,
+                   build_choices=True):
+    """
+    Run one test body against an already-started client.
+
+    Wires the shared shutdown event, prints the banner and optional intro,
+    builds the Downloader and (when dialogs_limit is set) fetches the dialog
+    list once, then awaits body(downloader, dialogs, choices). Exceptions
+    are reported in the scripts' usual format and buffered logs are flushed
+    on the way out.
+    """
+    loop = asyncio.get_running_loop()
+    shutdown_event = install_shutdown(loop)
+
+    tui.print_banner()
+    if intro:
+        tui.print_info(intro)
+
+    downloader = Downloader(client, shutdown_event=shutdown_event)
+
+    dialogs = choices = None
+    try:
+        if dialogs_limit is not None:
+            tui.print_info("Fetching available chats...")
+            dialogs, choices = await downloader.list_dialogs(
+                limit=dialogs_limit, build_choices=build_choices
+            )
+            if not dialogs:
+                tui.print_error("No chats available.")
+                return
+        await body(downloader, dialogs, choices)
+    except KeyboardInterrupt:
+        tui.print_info("\nTest interrupted by user")
+    except Exception as e:
+        tui.print_error(f"An unexpected error occurred: {e}")
+        traceback.print_exc()
+    finally:
+        tui.flush_logs()